@@ -1,14 +1,15 @@
+import os
+import stat
 import sys
+import tempfile
 from pathlib import Path
+from typing import Optional
 
+import importlib
 from importlib import metadata
 import argparse
 import logging
-import zmq
 import appdirs
-import yaml
-
-from tomato import tomato, ketchup
 
 sys.path += sys.modules["tomato"].__path__
 
@@ -23,6 +24,54 @@ def set_loglevel(loglevel: int):
     logger.debug("loglevel set to '%s'", logging._levelToName[loglevel])
 
 
+def load_toml(path: Path) -> dict:
+    """
+    Parses the toml file at ``path`` using the C-accelerated :mod:`tomllib`, falling
+    back to the pure-Python :mod:`toml` package on Python < 3.11.
+    """
+    try:
+        import tomllib
+    except ImportError:
+        import toml
+
+        return toml.load(path)
+    with open(path, "rb") as inf:
+        return tomllib.load(inf)
+
+
+def ipc_path(port: int, create: bool = False) -> Optional[Path]:
+    """
+    Returns the path of the ``ipc`` socket of the tomato-daemon on ``port``. The
+    socket is placed in a per-user folder in the temporary directory, which is created
+    if ``create`` is set. Returns ``None`` if the folder does not exist or is not
+    private to the current user, or if the platform has no user ids.
+    """
+    if not hasattr(os, "getuid"):
+        return None
+    ipcdir = Path(tempfile.gettempdir()) / f"tomato-{os.getuid()}"
+    try:
+        if create:
+            ipcdir.mkdir(mode=0o700, exist_ok=True)
+        st = ipcdir.lstat()
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode):
+        return None
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        return None
+    return ipcdir / f"{port}.sock"
+
+
+def __getattr__(name: str):
+    """
+    Imports the :mod:`tomato.tomato` and :mod:`tomato.ketchup` submodules on first
+    access, so that ``--help`` and ``--version`` do not pay for their imports.
+    """
+    if name in {"tomato", "ketchup"}:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def run_tomato():
     dirs = appdirs.AppDirs("tomato", "dgbowl", version=VERSION)
     parser = argparse.ArgumentParser(add_help=False)
@@ -37,34 +86,34 @@ def run_tomato():
     subparsers = parser.add_subparsers(dest="subcommand", required=True)
 
     status = subparsers.add_parser("status")
-    status.set_defaults(func=tomato.status)
+    status.set_defaults(func="status")
 
     start = subparsers.add_parser("start")
-    start.set_defaults(func=tomato.start)
+    start.set_defaults(func="start")
 
     stop = subparsers.add_parser("stop")
-    stop.set_defaults(func=tomato.stop)
+    stop.set_defaults(func="stop")
 
     init = subparsers.add_parser("init")
-    init.set_defaults(func=tomato.init)
+    init.set_defaults(func="init")
 
     reload = subparsers.add_parser("reload")
-    reload.set_defaults(func=tomato.reload)
+    reload.set_defaults(func="reload")
 
     pipeline = subparsers.add_parser("pipeline")
     pipparsers = pipeline.add_subparsers(dest="subsubcommand", required=True)
 
     pip_load = pipparsers.add_parser("load")
-    pip_load.set_defaults(func=tomato.pipeline_load)
+    pip_load.set_defaults(func="pipeline_load")
     pip_load.add_argument("pipeline")
     pip_load.add_argument("sampleid")
 
     pip_eject = pipparsers.add_parser("eject")
-    pip_eject.set_defaults(func=tomato.pipeline_eject)
+    pip_eject.set_defaults(func="pipeline_eject")
     pip_eject.add_argument("pipeline")
 
     pip_ready = pipparsers.add_parser("ready")
-    pip_ready.set_defaults(func=tomato.pipeline_ready)
+    pip_ready.set_defaults(func="pipeline_ready")
     pip_ready.add_argument("pipeline")
 
     for p in [parser, verbose]:
@@ -138,10 +187,17 @@ def run_tomato():
     verbosity = min(max((2 + args.quiet - args.verbose) * 10, 10), 50)
     set_loglevel(verbosity)
 
+    # the submodules are only imported once the arguments are parsed
+    import zmq
+    from tomato import tomato
+
     context = zmq.Context()
     if "func" in args:
-        ret = args.func(**vars(args), context=context, verbosity=verbosity)
+        func = getattr(tomato, args.func)
+        ret = func(**vars(args), context=context, verbosity=verbosity)
         if args.yaml:
+            import yaml
+
             print(yaml.dump(ret.dict()))
         else:
             print(f"{'Success' if ret.success else 'Failure'}: {ret.msg}")
@@ -178,7 +234,11 @@ def run_ketchup():
     submit = subparsers.add_parser("submit")
     submit.add_argument(
         "payload",
-        help="File containing the payload to be submitted to tomato.",
+        nargs="+",
+        help=(
+            "File(s) containing the payload(s) to be submitted to tomato. "
+            "Several payloads are submitted as separate jobs in one request."
+        ),
         default=None,
     )
     submit.add_argument(
@@ -187,7 +247,7 @@ def run_ketchup():
         help="Set the job name of the submitted job to?",
         default=None,
     )
-    submit.set_defaults(func=ketchup.submit)
+    submit.set_defaults(func="submit")
 
     status = subparsers.add_parser("status")
     status.add_argument(
@@ -200,7 +260,7 @@ def run_ketchup():
         type=int,
         default=None,
     )
-    status.set_defaults(func=ketchup.status)
+    status.set_defaults(func="status")
 
     cancel = subparsers.add_parser("cancel")
     cancel.add_argument(
@@ -213,7 +273,7 @@ def run_ketchup():
         type=int,
         default=None,
     )
-    cancel.set_defaults(func=ketchup.cancel)
+    cancel.set_defaults(func="cancel")
 
     snapshot = subparsers.add_parser("snapshot")
     snapshot.add_argument(
@@ -226,7 +286,7 @@ def run_ketchup():
         type=int,
         default=None,
     )
-    snapshot.set_defaults(func=ketchup.snapshot)
+    snapshot.set_defaults(func="snapshot")
 
     search = subparsers.add_parser("search")
     search.add_argument(
@@ -241,7 +301,7 @@ def run_ketchup():
         default=False,
         help="Search also in completed jobs.",
     )
-    search.set_defaults(func=ketchup.search)
+    search.set_defaults(func="search")
 
     for p in [submit, status, cancel, snapshot, search]:
         p.add_argument(
@@ -271,19 +331,27 @@ def run_ketchup():
     verbosity = min(max((2 + args.quiet - args.verbose) * 10, 10), 50)
     set_loglevel(verbosity)
 
+    import zmq
+    from tomato import tomato, ketchup
+
     if "func" in args:
         context = zmq.Context()
         status = tomato.status(**vars(args), context=context)
         if not status.success:
             if args.yaml:
+                import yaml
+
                 print(yaml.dump(status.dict()))
             else:
                 print(f"Failure: {status.msg}")
         else:
-            ret = args.func(
+            func = getattr(ketchup, args.func)
+            ret = func(
                 **vars(args), verbosity=verbosity, context=context, status=status
             )
             if args.yaml:
+                import yaml
+
                 print(yaml.dump(ret.dict()))
             else:
                 print(f"{'Success' if ret.success else 'Failure'}: {ret.msg}")
@@ -10,10 +10,10 @@ import logging
 import argparse
 from pathlib import Path
 from threading import Thread
-import toml
 import time
 import zmq
 
+from tomato import load_toml, ipc_path
 from tomato.models import Reply, Daemon
 import tomato.daemon.cmd as cmd
 import tomato.daemon.job
@@ -53,7 +53,7 @@ def tomato_daemon():
     parser.add_argument("--appdir", "-A", type=str, default=str(Path.cwd()))
     parser.add_argument("--logdir", "-L", type=str, default=str(Path.cwd()))
     args = parser.parse_args()
-    settings = toml.load(Path(args.appdir) / "settings.toml")
+    settings = load_toml(Path(args.appdir) / "settings.toml")
 
     daemon = Daemon(**vars(args), status="bootstrap", settings=settings)
     setup_logging(daemon)
@@ -66,6 +66,16 @@ def tomato_daemon():
     rep = context.socket(zmq.REP)
     logger.debug("binding zmq.REP socket on port %d", daemon.port)
     rep.bind(f"tcp://127.0.0.1:{daemon.port}")
+    # local clients such as ketchup can skip the TCP stack
+    ipcpath = ipc_path(daemon.port, create=True) if zmq.has("ipc") else None
+    if ipcpath is None:
+        logger.warning("no private ipc folder available, listening on tcp only")
+    else:
+        logger.debug("binding zmq.REP socket on '%s'", ipcpath)
+        try:
+            rep.bind(f"ipc://{ipcpath}")
+        except zmq.ZMQError as e:
+            logger.warning("could not bind on '%s', using tcp only: %s", ipcpath, e)
     poller = zmq.Poller()
     poller.register(rep, zmq.POLLIN)
 
@@ -81,13 +91,13 @@ def tomato_daemon():
         socks = dict(poller.poll(1000))
         if rep in socks:
             msg = rep.recv_pyobj()
-            logger.debug(f"received {msg=}")
+            logger.debug("received msg=%r", msg)
             if "cmd" not in msg:
-                logger.error(f"received msg without cmd: {msg=}")
+                logger.error("received msg without cmd: msg=%r", msg)
                 ret = Reply(success=False, msg="received msg without cmd", data=msg)
             elif hasattr(cmd, msg["cmd"]):
                 ret = getattr(cmd, msg["cmd"])(msg, daemon)
-            logger.debug(f"reply with {ret=}")
+            logger.debug("reply with ret=%r", ret)
             rep.send_pyobj(ret)
         if daemon.status == "stop":
             for mgr, label in [(jmgr, "job"), (dmgr, "driver")]:
@@ -111,4 +121,5 @@ def tomato_daemon():
         if tN - t0 > 10:
             io.store(daemon)
             t0 = tN
+    rep.close()
     logger.critical("tomato-daemon on port %d is exiting", daemon.port)
@@ -31,29 +31,6 @@ import tomato.daemon.io as io
 logger = logging.getLogger(__name__)
 
 
-def merge_pipelines(
-    cur: dict[str, Pipeline], new: dict[str, Pipeline]
-) -> dict[str, Pipeline]:
-    """
-    Helper function for merging a :class:`dict` of new :class:`Pipelines` into the
-    current :class:`dict`.
-    """
-    ret = {}
-    for pname, pip in cur.items():
-        if pname not in new:
-            if pip.jobid is not None:
-                ret[pname] = pip
-        else:
-            if pip.devs == new[pname].devs:
-                ret[pname] = pip
-            elif pip.jobid is None:
-                ret[pname] = new[pname]
-    for pname, pip in new.items():
-        if pname not in cur:
-            ret[pname] = pip
-    return ret
-
-
 def status(msg: dict, daemon: Daemon) -> Reply:
     return Reply(success=True, msg=daemon.status, data=daemon)
 
@@ -251,6 +228,20 @@ def job(msg: dict, daemon: Daemon) -> Reply:
     return Reply(success=True, msg="job updated", data=ret)
 
 
+def jobs(msg: dict, daemon: Daemon) -> Reply:
+    logger = logging.getLogger(f"{__name__}.jobs")
+    logger.debug("%s", msg)
+    ret = []
+    for jmsg in msg.get("params", []):
+        jobid = jmsg.get("id", None)
+        if jobid is not None and jobid not in daemon.jobs:
+            logger.error("job %d does not exist", jobid)
+            # return the jobs updated so far, so that the caller can resume
+            return Reply(success=False, msg=f"job {jobid} does not exist", data=ret)
+        ret.append(job(jmsg, daemon).data)
+    return Reply(success=True, msg="jobs updated", data=ret)
+
+
 def driver(msg: dict, daemon: Daemon) -> Reply:
     return _api(
         otype="driver",
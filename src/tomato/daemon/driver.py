@@ -19,6 +19,7 @@ from pathlib import Path
 import zmq
 import psutil
 
+from tomato.daemon.log import setup_queue_logging, stop_on_sigterm
 from tomato.driverinterface_1_0 import ModelInterface
 from tomato.drivers import driver_to_interface
 from tomato.models import Reply
@@ -98,11 +99,8 @@ def tomato_driver() -> None:
     logfile = f"driver_{args.driver}_{args.port}.log"
     logpath = Path(args.logdir) / logfile
     logger = logging.getLogger(f"{__name__}.tomato_driver({args.driver!r})")
-    logging.basicConfig(
-        level=args.verbosity,
-        format="%(asctime)s - %(levelname)8s - %(name)-30s - %(message)s",
-        handlers=[logging.FileHandler(logpath, mode="a")],
-    )
+    listener = setup_queue_logging(logpath, args.verbosity)
+    stop_on_sigterm(listener)
 
     # PORTS
     context = zmq.Context()
@@ -139,7 +137,7 @@ def tomato_driver() -> None:
     ret = req.recv_pyobj()
     if not ret.success:
         logger.error("could not push driver '%s' state to tomato-daemon", args.driver)
-        logger.debug(f"{ret=}")
+        logger.debug("ret=%r", ret)
         return
 
     logger.info("driver '%s' is entering main loop", args.driver)
@@ -153,7 +151,7 @@ def tomato_driver() -> None:
             msg = rep.recv_pyobj()
             logger.debug("received msg=%s", msg)
             if "cmd" not in msg:
-                logger.error(f"received msg without cmd: {msg=}")
+                logger.error("received msg without cmd: msg=%r", msg)
                 ret = Reply(success=False, msg="received msg without cmd", data=msg)
             elif msg["cmd"] == "status":
                 ret = Reply(
@@ -306,7 +304,7 @@ def manager(port: int, timeout: int = 1000):
                 dreq.connect(f"tcp://127.0.0.1:{drv.port}")
                 dreq.send_pyobj(dict(cmd="register", params=None, sender=sender))
                 ret = dreq.recv_pyobj()
-                logger.debug(f"{ret=}")
+                logger.debug("ret=%r", ret)
                 dreq.close()
         time.sleep(1 if len(spawned_drivers) > 0 else 0.1)
 
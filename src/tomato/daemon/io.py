@@ -11,9 +11,11 @@ import logging
 import xarray as xr
 import importlib.metadata
 from pathlib import Path
+from typing import Optional
 from tomato.models import Daemon, Job
 
 logger = logging.getLogger(__name__)
+VERSION = importlib.metadata.version("tomato")
 
 
 def store(daemon: Daemon):
@@ -52,37 +54,58 @@ def merge_netcdfs(job: Job, snapshot=False):
     logger = logging.getLogger(f"{__name__}.merge_netcdf")
     logger.debug("opening datasets")
     datasets = []
-    logger.debug(f"{job=}")
-    logger.debug(f"{job.jobpath=}")
+    logger.debug("job=%r", job)
+    logger.debug("job.jobpath=%r", job.jobpath)
     for fn in Path(job.jobpath).glob("*.pkl"):
-        with pickle.load(fn.open("rb")) as ds:
+        ds = pickle_to_data(fn)
+        if ds is not None:
             datasets.append(ds)
     logger.debug("creating a DataTree from %d groups", len(datasets))
     dt = xr.DataTree.from_dict({ds.attrs["role"]: ds for ds in datasets})
-    logger.debug(f"{dt=}")
+    logger.debug("dt=%r", dt)
     root_attrs = {
-        "tomato_version": importlib.metadata.version("tomato"),
+        "tomato_version": VERSION,
         "tomato_Job": job.model_dump_json(),
     }
     dt.attrs = root_attrs
     outpath = job.snappath if snapshot else job.respath
     logger.debug("saving DataTree into '%s'", outpath)
     dt.to_netcdf(outpath, engine="h5netcdf")
-    logger.debug(f"{dt=}")
+    logger.debug("dt=%r", dt)
 
 
 def data_to_pickle(ds: xr.Dataset, path: Path, role: str):
     """
-    Dumps the data provided as :class:`xr.Dataset` into a ``pickle``. Concatenates with
-    any existing data stored in the ``pickle``.
+    Appends the data provided as :class:`xr.Dataset` into a ``pickle``. The existing
+    data stored in the ``pickle`` is not read back, instead the individual
+    :class:`xr.Datasets` are concatenated by :func:`pickle_to_data`.
     """
     logger = logging.getLogger(f"{__name__}.data_to_pickle")
     ds.attrs["role"] = role
-    logger.debug("checking for existing pickle at '%s'", path)
-    if path.exists():
-        with pickle.load(path.open("rb")) as oldds:
-            logger.debug("concatenating Dataset with existing data")
-            ds = xr.concat([oldds, ds], dim="uts")
-    logger.debug("dumping Dataset into pickle at '%s'", path)
-    with path.open("wb") as out:
+    logger.debug("appending Dataset into pickle at '%s'", path)
+    with path.open("ab") as out:
         pickle.dump(ds, out, protocol=5)
+
+
+def pickle_to_data(path: Path) -> Optional[xr.Dataset]:
+    """
+    Loads all :class:`xr.Datasets` appended into a ``pickle`` by :func:`data_to_pickle`,
+    and concatenates them into a single :class:`xr.Dataset`.
+
+    Returns ``None`` if the ``pickle`` does not contain any data yet.
+    """
+    logger = logging.getLogger(f"{__name__}.pickle_to_data")
+    datasets = []
+    with path.open("rb") as inp:
+        while True:
+            try:
+                datasets.append(pickle.load(inp))
+            except EOFError:
+                break
+            except pickle.UnpicklingError:
+                logger.warning("skipping incomplete Dataset in pickle at '%s'", path)
+                break
+    if len(datasets) == 0:
+        return None
+    logger.debug("concatenating %d Datasets from '%s'", len(datasets), path)
+    return xr.concat(datasets, dim="uts")
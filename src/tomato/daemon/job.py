@@ -15,19 +15,31 @@
 import os
 import subprocess
 import logging
-import json
+import pickle
 import time
 import argparse
 from importlib import metadata
 from datetime import datetime, timezone
 from pathlib import Path
 from threading import current_thread, Thread
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 import zmq
 import psutil
+from pydantic_core import from_json, to_json
 
 from tomato.daemon.io import merge_netcdfs, data_to_pickle
-from tomato.models import Pipeline, Daemon, Component, Device, Driver, Job, CompletedJob
+from tomato.daemon.log import setup_queue_logging, stop_on_sigterm
+from tomato.models import (
+    Pipeline,
+    Daemon,
+    Component,
+    Device,
+    Driver,
+    Job,
+    CompletedJob,
+    Reply,
+)
 from dgbowl_schemas.tomato import to_payload
 from dgbowl_schemas.tomato.payload import Task
 
@@ -47,7 +59,9 @@ def find_matching_pipelines(
         for comp in pip.components:
             c = cmps[comp]
             roles.add(c.role)
-            capabs.update(c.capabilities)
+            # capabilities are unknown until the driver registers the component
+            if c.capabilities is not None:
+                capabs.update(c.capabilities)
         if req_tags.intersection(roles) == req_tags:
             if req_capabs.intersection(capabs) == req_capabs:
                 candidates.append(pip)
@@ -76,11 +90,11 @@ def kill_tomato_job(process: psutil.Process):
     elif psutil.POSIX:
         to_kill = [p for p in process.children()]
     for proc in to_kill:
-        logger.warning(f"killing process {proc.name()!r} with pid {proc.pid}")
+        logger.warning("killing process %r with pid %s", proc.name(), proc.pid)
         proc.terminate()
     gone, alive = psutil.wait_procs(to_kill, timeout=1)
-    logger.debug(f"{gone=}")
-    logger.debug(f"{alive=}")
+    logger.debug("gone=%r", gone)
+    logger.debug("alive=%r", alive)
 
 
 def manage_running_pips(daemon: Daemon, req):
@@ -97,7 +111,7 @@ def manage_running_pips(daemon: Daemon, req):
     """
     logger = logging.getLogger(f"{__name__}.manage_running_pips")
     running = [pip for pip in daemon.pips.values() if pip.jobid is not None]
-    logger.debug(f"{running=}")
+    logger.debug("running=%r", running)
     for pip in running:
         job = daemon.jobs[pip.jobid]
         if isinstance(job, CompletedJob):
@@ -105,20 +119,22 @@ def manage_running_pips(daemon: Daemon, req):
         elif job.pid is None:
             continue
         pidexists = psutil.pid_exists(job.pid)
-        logger.debug(f"{pidexists=}")
+        logger.debug("pidexists=%r", pidexists)
         reset = False
         # running jobs scheduled for killing (status == 'rd') should be killed
         if pidexists and job.status == "rd":
-            logger.debug(f"job {job.id} with pid {job.pid} will be terminated")
+            logger.debug("job %s with pid %s will be terminated", job.id, job.pid)
             proc = psutil.Process(pid=job.pid)
             kill_tomato_job(proc)
-            logger.info(f"job {job.id} with pid {job.pid} was terminated successfully")
+            logger.info(
+                "job %s with pid %s was terminated successfully", job.id, job.pid
+            )
             merge_netcdfs(job)
             reset = True
             params = dict(status="cd")
         # dead jobs marked as running (status == 'r') should be cleared
         elif (not pidexists) and job.status == "r":
-            logging.warning(f"the pid {job.pid} of job {job.id} has not been found")
+            logger.warning("the pid %s of job %s has not been found", job.pid, job.id)
             reset = True
             params = dict(status="ce")
         if reset:
@@ -126,14 +142,14 @@ def manage_running_pips(daemon: Daemon, req):
             req.send_pyobj(dict(cmd="job", id=job.id, params=params))
             ret = req.recv_pyobj()
             if not ret.success:
-                logger.error(f"could not set job {job.id} status {params['status']!r}")
+                logger.error("could not set job %s status %r", job.id, params["status"])
                 continue
-            logger.debug(f"pipeline {pip.name!r} will be reset")
+            logger.debug("pipeline %r will be reset", pip.name)
             params = dict(jobid=None, ready=False, name=pip.name)
             req.send_pyobj(dict(cmd="pipeline", params=params))
             ret = req.recv_pyobj()
             if not ret.success:
-                logger.error(f"could not set params {params} on pip: {pip.name!r}")
+                logger.error("could not set params %s on pip: %r", params, pip.name)
                 continue
 
 
@@ -146,11 +162,19 @@ def check_queued_jobs(daemon: Daemon, req) -> dict[int, list[Pipeline]]:
     """
     logger = logging.getLogger(f"{__name__}.check_queued_jobs")
     matched = {}
+    # queued jobs with the same component tags and techniques match the same
+    # pipelines, so that the pipelines are only scanned once per set of requirements
+    candidates = {}
     queue = [job for job in daemon.jobs.values() if job.status in {"q", "qw"}]
     for job in queue:
-        matched[job.id] = find_matching_pipelines(
-            daemon.pips, daemon.cmps, job.payload.method
+        method = job.payload.method
+        key = (
+            frozenset(task.component_tag for task in method),
+            frozenset(task.technique_name for task in method),
         )
+        if key not in candidates:
+            candidates[key] = find_matching_pipelines(daemon.pips, daemon.cmps, method)
+        matched[job.id] = candidates[key]
         if len(matched[job.id]) > 0 and job.status == "q":
             logger.info(
                 "job %d can queue on pips: {%s}",
@@ -181,12 +205,12 @@ def action_queued_jobs(daemon, matched, req):
                 continue
             elif pip.sampleid != job.payload.sample.name:
                 continue
-            logger.info(f"job {job.id} found a matched & ready pip: {pip.name!r}")
+            logger.info("job %s found a matched & ready pip: %r", job.id, pip.name)
             params = dict(jobid=job.id, ready=False, name=pip.name)
             req.send_pyobj(dict(cmd="pipeline", params=params))
             ret = req.recv_pyobj()
             if not ret.success:
-                logger.error(f"could not set params {params} on pip: {pip.name!r}")
+                logger.error("could not set params %s on pip: %r", params, pip.name)
                 continue
             else:
                 pip.ready = False
@@ -202,8 +226,7 @@ def action_queued_jobs(daemon, matched, req):
                 "job": dict(id=job.id, path=str(root)),
             }
 
-            with jpath.open("w", encoding="UTF-8") as of:
-                json.dump(jobargs, of, indent=1)
+            jpath.write_bytes(to_json(jobargs, indent=1))
 
             cmd = [
                 "tomato-job",
@@ -219,7 +242,9 @@ def action_queued_jobs(daemon, matched, req):
                 subprocess.Popen(cmd, creationflags=cfs)
             elif psutil.POSIX:
                 subprocess.Popen(cmd, start_new_session=True)
-            logger.info(f"job {jobid} started on pip: {pip.name!r} and path: {jpath!r}")
+            logger.info(
+                "job %s started on pip: %r and path: %r", jobid, pip.name, jpath
+            )
             break
 
 
@@ -245,7 +270,7 @@ def manager(port: int, timeout: int = 500):
         req.send_pyobj(dict(cmd="status", sender=f"{__name__}.manager"))
         events = dict(poller.poll(to))
         if req not in events:
-            logger.warning(f"could not contact tomato-daemon in {to} ms")
+            logger.warning("could not contact tomato-daemon in %s ms", to)
             to = to * 2
             continue
         elif to > timeout:
@@ -269,7 +294,7 @@ def lazy_pirate(
         req.send_pyobj(pyobj)
         events = dict(poller.poll(timeout))
         if req not in events:
-            logger.warning(f"could not contact tomato-daemon in {timeout/1000} s")
+            logger.warning("could not contact tomato-daemon in %s s", timeout / 1000)
             req.setsockopt(zmq.LINGER, 0)
             req.close()
             poller.unregister(req)
@@ -279,7 +304,7 @@ def lazy_pirate(
         else:
             break
     else:
-        logger.error(f"number of connection retries exceeded: {retries}")
+        logger.error("number of connection retries exceeded: %s", retries)
         raise RuntimeError(f"Number of connection retries exceeded: {retries}")
     return req.recv_pyobj()
 
@@ -330,8 +355,7 @@ def tomato_job() -> None:
     )
     args = parser.parse_args()
 
-    with args.jobfile.open() as infile:
-        jsdata = json.load(infile)
+    jsdata = from_json(args.jobfile.read_bytes())
     payload = to_payload(**jsdata["payload"])
 
     pip = jsdata["pipeline"]["name"]
@@ -339,14 +363,11 @@ def tomato_job() -> None:
     jobpath = Path(jsdata["job"]["path"]).resolve()
 
     logpath = jobpath / f"job-{jobid}.log"
-    logging.basicConfig(
-        level=args.verbosity,
-        format="%(asctime)s - %(levelname)8s - %(name)-30s - %(message)s",
-        handlers=[logging.FileHandler(logpath, mode="a")],
-    )
+    listener = setup_queue_logging(logpath, args.verbosity)
+    stop_on_sigterm(listener)
     logger = logging.getLogger(__name__)
 
-    logger.debug(f"{payload=}")
+    logger.debug("payload=%r", payload)
 
     ready = payload.settings.unlock_when_done
     verbosity = payload.settings.verbosity
@@ -359,7 +380,7 @@ def tomato_job() -> None:
     elif psutil.POSIX:
         pid = os.getpid()
 
-    logger.debug(f"assigning job {jobid} with pid {pid} into pipeline {pip!r}")
+    logger.debug("assigning job %s with pid %s into pipeline %r", jobid, pid, pip)
     context = zmq.Context()
     req = context.socket(zmq.REQ)
     req.connect(f"tcp://127.0.0.1:{args.port}")
@@ -375,7 +396,7 @@ def tomato_job() -> None:
 
     output = payload.settings.output
     outpath = Path(output.path)
-    logger.debug(f"output folder is {outpath}")
+    logger.debug("output folder is %s", outpath)
     if outpath.exists():
         assert outpath.is_dir()
     else:
@@ -413,7 +434,7 @@ def tomato_job() -> None:
     logger.info("resetting pipeline '%s'", pip)
     params = dict(jobid=None, ready=ready, name=pip)
     ret = lazy_pirate(pyobj=dict(cmd="pipeline", params=params), **pkwargs)
-    logger.debug(f"{ret=}")
+    logger.debug("ret=%r", ret)
     if not ret.success:
         logger.error("could not reset pipeline '%s'", pip)
         return 1
@@ -421,6 +442,7 @@ def tomato_job() -> None:
 
 
 def job_thread(
+    context: zmq.Context,
     tasks: list,
     component: Component,
     device: Device,
@@ -435,41 +457,60 @@ def job_thread(
     for data, and moves on to the next task as instructed in the payload.
 
     Stores the data for that Component as a `pickle` of a :class:`xr.Dataset`.
+
+    The :class:`zmq.Context` is shared between all job threads, so that only a
+    single set of IO threads is spawned per `tomato-job`.
     """
     sender = f"{__name__}.job_thread({current_thread().ident})"
     logger = logging.getLogger(sender)
-    logger.debug(f"in job thread of {component.role!r}")
+    logger.debug("in job thread of %r", component.role)
 
-    context = zmq.Context()
-    req = context.socket(zmq.REQ)
+    # a DEALER socket is used so that the task_data and task_status requests can be
+    # pipelined: the REP socket of the tomato-driver replies to them in order
+    req = context.socket(zmq.DEALER)
     req.connect(f"tcp://127.0.0.1:{driver.port}")
-    logger.debug(f"job thread of {component.role!r} connected to tomato-daemon")
+    logger.debug("job thread of %r connected to tomato-daemon", component.role)
+
+    def send(msg: bytes):
+        req.send_multipart([b"", msg])
+
+    def recv() -> Reply:
+        return pickle.loads(req.recv_multipart()[-1])
 
     kwargs = dict(address=component.address, channel=component.channel)
+    # the task_status and task_data requests are the same for the whole job thread,
+    # so they are pickled only once
+    status_msg = pickle.dumps(dict(cmd="task_status", params=kwargs), protocol=5)
+    data_msg = pickle.dumps(dict(cmd="task_data", params=kwargs), protocol=5)
 
     datapath = Path(jobpath) / f"{component.role}.pkl"
     logger.debug("distributing tasks:")
     for task in tasks:
-        logger.debug(f"{task=}")
+        logger.debug("task=%r", task)
         while True:
             logger.debug("polling component '%s' for task readiness", component.role)
-            req.send_pyobj(dict(cmd="task_status", params={**kwargs}))
-            ret = req.recv_pyobj()
+            send(status_msg)
+            ret = recv()
             if ret.success and ret.data["can_submit"]:
                 break
             logger.warning("cannot submit onto component '%s', waiting", component.role)
             time.sleep(1e-1)
         logger.debug("sending task to component '%s'", component.role)
-        req.send_pyobj(dict(cmd="task_start", params={"task": task, **kwargs}))
-        ret = req.recv_pyobj()
+        send(pickle.dumps(dict(cmd="task_start", params={"task": task, **kwargs})))
+        ret = recv()
 
         t0 = time.perf_counter()
         while True:
             tN = time.perf_counter()
-            if tN - t0 > device.pollrate:
+            poll_data = tN - t0 > device.pollrate
+            if poll_data:
                 logger.debug("polling component '%s' for data", component.role)
-                req.send_pyobj(dict(cmd="task_data", params={**kwargs}))
-                ret = req.recv_pyobj()
+                send(data_msg)
+            logger.debug("polling component '%s' for task completion", component.role)
+            send(status_msg)
+
+            if poll_data:
+                ret = recv()
                 if ret.success:
                     logger.debug("pickling received data")
                     ds = ret.data
@@ -477,24 +518,23 @@ def job_thread(
                     data_to_pickle(ds, datapath, role=component.role)
                 t0 += device.pollrate
 
-            logger.debug("polling component '%s' for task completion", component.role)
-            req.send_pyobj(dict(cmd="task_status", params={**kwargs}))
-            ret = req.recv_pyobj()
+            ret = recv()
             if ret.success and not ret.data["running"]:
                 logger.debug("task no longer running, break")
                 break
             time.sleep(max(1e-1, (device.pollrate - (tN - t0)) / 2))
 
         logger.debug("fetching final data for task")
-        req.send_pyobj(dict(cmd="task_data", params={**kwargs}))
-        ret = req.recv_pyobj()
+        send(data_msg)
+        ret = recv()
         if ret.success:
             data_to_pickle(ret.data, datapath, role=component.role)
     logger.debug("all tasks done on component '%s', resetting", component.role)
-    req.send_pyobj(dict(cmd="dev_reset", params={**kwargs}))
-    ret = req.recv_pyobj()
+    send(pickle.dumps(dict(cmd="dev_reset", params={**kwargs})))
+    ret = recv()
     if not ret.success:
         logger.warning("could not reset component '%s': %s", component.role, ret.msg)
+    req.close()
 
 
 def job_main_loop(
@@ -524,7 +564,7 @@ def job_main_loop(
             time.sleep(1)
 
     pipeline = daemon.pips[pipname]
-    logger.debug(f"{pipeline=}")
+    logger.debug("pipeline=%r", pipeline)
 
     # collate steps by role
     plan = {}
@@ -532,13 +572,13 @@ def job_main_loop(
         if step.component_tag not in plan:
             plan[step.component_tag] = []
         plan[step.component_tag].append(step)
-    logger.debug(f"{plan=}")
+    logger.debug("plan=%r", plan)
 
     # distribute plan into threads
     threads = {}
     for cmpk in pipeline.components:
         component = daemon.cmps[cmpk]
-        logger.debug(f"{component=}")
+        logger.debug("component=%r", component)
         if component.role not in plan:
             continue
         tasks = plan[component.role]
@@ -549,24 +589,40 @@ def job_main_loop(
         logger.debug(" driver=%s", driver)
         threads[component.role] = Thread(
             target=job_thread,
-            args=(tasks, component, device, driver, job.jobpath, logpath),
+            args=(context, tasks, component, device, driver, job.jobpath, logpath),
             name="job-thread",
         )
         threads[component.role].start()
 
-    # wait until threads join or we're killed
+    # wait until threads join or we're killed, waking up only to create snapshots;
+    # the snapshots are merged in the background, and are skipped if the previous
+    # one is still being written. Snapshots are at most once per second, and are
+    # rescheduled from the current time if we fall behind.
     snapshot = job.payload.settings.snapshot
-    t0 = time.perf_counter()
-    while True:
-        logger.debug("tick")
-        tN = time.perf_counter()
-        if snapshot is not None and tN - t0 > snapshot.frequency:
-            logger.debug("creating snapshot")
-            merge_netcdfs(job, snapshot=True)
-            t0 += snapshot.frequency
-        joined = [proc.is_alive() is False for proc in threads.values()]
-        if all(joined):
-            break
-        else:
-            # We'd like to execute this loop exactly once every second
-            time.sleep(1.0 - tN % 1)
+    if snapshot is None:
+        t_next = None
+    else:
+        period = max(snapshot.frequency, 1.0)
+        t_next = time.perf_counter() + period
+    merging = None
+
+    def report(fut):
+        if fut.exception() is not None:
+            logger.error("creating snapshot failed: %r", fut.exception())
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for thread in threads.values():
+            while thread.is_alive():
+                if t_next is None:
+                    thread.join()
+                    continue
+                thread.join(timeout=max(0, t_next - time.perf_counter()))
+                if time.perf_counter() < t_next:
+                    continue
+                if merging is None or merging.done():
+                    logger.debug("creating snapshot")
+                    merging = executor.submit(merge_netcdfs, job, snapshot=True)
+                    merging.add_done_callback(report)
+                else:
+                    logger.debug("previous snapshot not finished, skipping")
+                t_next = max(t_next + period, time.perf_counter() + 1.0)
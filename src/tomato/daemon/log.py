@@ -0,0 +1,68 @@
+"""
+**tomato.daemon.log**: logging helpers for the tomato-driver and tomato-job processes
+-------------------------------------------------------------------------------------
+.. codeauthor::
+    Peter Kraus
+
+"""
+
+import os
+import atexit
+import signal
+import logging
+from pathlib import Path
+from queue import SimpleQueue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class BatchFileHandler(logging.FileHandler):
+    """
+    A :class:`~logging.FileHandler` which flushes the file only once the ``queue`` of
+    the :class:`~logging.handlers.QueueListener` driving it is drained, so that a
+    burst of records is written in one batch.
+    """
+
+    def __init__(self, logpath: Path, queue: SimpleQueue):
+        super().__init__(logpath, mode="a")
+        self.queue = queue
+
+    def flush(self):
+        if self.queue.empty():
+            super().flush()
+
+
+def setup_queue_logging(logpath: Path, verbosity: int) -> QueueListener:
+    """
+    Helper function to set up logging into ``logpath`` for the multi-threaded
+    `tomato-driver` and `tomato-job` processes.
+
+    The records are formatted in the emitting thread, and written into the file by a
+    :class:`~logging.handlers.QueueListener`, so that the threads do not contend for
+    the file lock. The listener is stopped at exit; use :func:`stop_on_sigterm` to
+    also stop it when the process is terminated.
+    """
+    logqueue = SimpleQueue()
+    listener = QueueListener(logqueue, BatchFileHandler(logpath, logqueue))
+    logging.basicConfig(
+        level=verbosity,
+        format="%(asctime)s - %(levelname)8s - %(name)-30s - %(message)s",
+        handlers=[QueueHandler(logqueue)],
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def stop_on_sigterm(listener: QueueListener):
+    """
+    Replaces the ``SIGTERM`` handler of the process with one that stops the
+    ``listener``, so that the queued records are written, before terminating the
+    process as the default handler would.
+    """
+
+    def terminate(signum, frame):
+        listener.stop()
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+    signal.signal(signal.SIGTERM, terminate)
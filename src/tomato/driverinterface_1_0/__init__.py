@@ -108,7 +108,9 @@ class ModelInterface(metaclass=ABCMeta):
             then handles setting all :class:`Attrs` using the :func:`prepare_task`
             function, and finally handles the main loop of the task, periodically running
             the :func:`do_task` function (using `task.sampling_interval`) until the
-            maximum task duration (i.e. `task.max_duration`) is exceeded.
+            maximum task duration (i.e. `task.max_duration`) is exceeded. Between
+            the calls to :func:`do_task`, the thread sleeps until the next datapoint
+            is due.
 
             The :obj:`self.thread` is re-primed for future :class:`Tasks` at the end
             of this function.
@@ -116,18 +118,24 @@ class ModelInterface(metaclass=ABCMeta):
             thread = current_thread()
             task: Task = self.task_list.get()
             self.prepare_task(task)
+            interval = task.sampling_interval
             t_start = time.perf_counter()
             t_prev = t_start
+            t_end = t_start + task.max_duration
             self.data = defaultdict(list)
-            while getattr(thread, "do_run"):
+            while thread.do_run:
                 t_now = time.perf_counter()
-                if t_now - t_prev > task.sampling_interval:
+                if t_now - t_prev > interval:
                     with self.datalock:
                         self.do_task(task, t_start=t_start, t_now=t_now, t_prev=t_prev)
-                    t_prev += task.sampling_interval
-                if t_now - t_start > task.max_duration:
+                    t_prev += interval
+                if t_now > t_end:
                     break
-                time.sleep(max(1e-2, task.sampling_interval / 20))
+                # sleep until the next datapoint is due, but at least 10 ms so that
+                # a short interval does not spin, and at most 0.5 s so that a request
+                # to stop the task is noticed before reset() stops waiting for it
+                t_next = min(t_prev + interval, t_end)
+                time.sleep(min(max(1e-2, t_next - time.perf_counter()), 0.5))
 
             self.task_list.task_done()
             self.running = False
@@ -14,10 +14,14 @@ from tomato.driverinterface_1_0 import ModelInterface
 
 logger = logging.getLogger(__name__)
 
+_interfaces: dict[str, ModelInterface] = {}
+
 
 def driver_to_interface(drivername: str) -> Union[None, ModelInterface]:
-    modname = f"tomato_{drivername.replace('-', '_')}"
+    if drivername in _interfaces:
+        return _interfaces[drivername]
 
+    modname = f"tomato_{drivername.replace('-', '_')}"
     try:
         mod = importlib.import_module(modname)
     except ModuleNotFoundError as e:
@@ -25,6 +29,7 @@ def driver_to_interface(drivername: str) -> Union[None, ModelInterface]:
         return None
     else:
         if hasattr(mod, "DriverInterface"):
-            return getattr(mod, "DriverInterface")
+            _interfaces[drivername] = getattr(mod, "DriverInterface")
+            return _interfaces[drivername]
         else:
             return None
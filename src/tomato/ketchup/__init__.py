@@ -15,39 +15,158 @@ functions:
 
 """
 
-import json
 import logging
 from pathlib import Path
 from datetime import datetime, timezone
-import yaml
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Union
 import zmq
-from packaging.version import Version
-from dgbowl_schemas.tomato import to_payload
 
-from tomato.daemon.io import merge_netcdfs
 from tomato.models import Reply, Daemon, Job
+from tomato.tomato import request, load_yaml
+
+# the parsers, payload schemas and the NetCDF machinery are only imported by the
+# functions that need them, as they dominate the startup time of ketchup
+if TYPE_CHECKING:
+    from packaging.version import Version
 
 log = logging.getLogger(__name__)
 
 __latest_payload__ = "1.0"
 
+# order in which the job statuses are reported by status
+_STATUS_ORDER = ("q", "qw", "r", "rd", "c", "cd", "ce")
+
+# status of jobs which are no longer in the queue
+_COMPLETED = frozenset(("c", "cd", "ce"))
+
+# status a job is set to when cancelled, jobs in other states are left alone
+_CANCEL_STATUS = {"q": "cd", "qw": "cd", "r": "rd"}
+
+
+@lru_cache
+def _parse_version(version: str) -> "Version":
+    from packaging.version import Version
+
+    return Version(version)
+
+
+def _to_payload(pldict: dict):
+    """
+    Validates ``pldict`` as a payload.
+
+    If ``pldict`` declares its ``version``, only the matching ``Payload_X_Y`` model
+    exported by :mod:`dgbowl_schemas.tomato` is tried; otherwise, or if that fails,
+    :func:`dgbowl_schemas.tomato.to_payload` falls back to trying every known payload
+    version in turn.
+    """
+    from pydantic import ValidationError
+    import dgbowl_schemas.tomato
+
+    version = pldict.get("version")
+    if isinstance(version, str):
+        try:
+            name = f"Payload_{version.replace('.', '_')}"
+            return getattr(dgbowl_schemas.tomato, name)(**pldict)
+        except (AttributeError, ValidationError):
+            pass
+    return dgbowl_schemas.tomato.to_payload(**pldict)
+
+
+# number of update() steps required to bring a payload class to __latest_payload__
+_migration_steps: dict[type, int] = {}
+
+
+def _migrate_payload(payload):
+    """
+    Updates the ``payload`` to the latest supported version, ``__latest_payload__``.
+
+    The number of update steps is cached for each payload class, so that the versions
+    of the intermediate payloads are only checked on the first submission.
+    """
+    cls = type(payload)
+    if cls in _migration_steps:
+        for _ in range(_migration_steps[cls]):
+            payload = payload.update()
+        return payload
+
+    maxver = _parse_version(__latest_payload__)
+    nsteps = 0
+    while hasattr(payload, "update"):
+        temp = payload.update()
+        if hasattr(temp, "version"):
+            if _parse_version(temp.version) > maxver:
+                break
+        payload = temp
+        nsteps += 1
+    _migration_steps[cls] = nsteps
+    return payload
+
+
+def _load_payload(payload: Path, cwd: str) -> Reply:
+    """
+    Loads, validates and migrates the ``yaml/json`` payload file ``payload``, setting
+    any unset output and snapshot paths to ``cwd``.
+
+    Reply contains the payload on success.
+    """
+    from pydantic_core import from_json
+    from yaml import YAMLError
+
+    # the payload is passed to the parsers as bytes, so that the decoding is done
+    # by the json or libyaml parser rather than in Python
+    try:
+        inf = payload.open("rb")
+    except (FileNotFoundError, IsADirectoryError):
+        return Reply(success=False, msg=f"payload file {payload} not found")
+
+    with inf:
+        try:
+            if payload.suffix == ".json":
+                pldict = from_json(inf.read())
+            elif payload.suffix in {".yml", ".yaml"}:
+                pldict = load_yaml(inf)
+            else:
+                msg = f"payload file {payload} must be a yaml or a json file"
+                return Reply(success=False, msg=msg)
+        except (ValueError, YAMLError) as e:
+            msg = f"could not parse payload file {payload}: {e}"
+            return Reply(success=False, msg=msg)
+
+    try:
+        payload = _migrate_payload(_to_payload(pldict))
+    except ValueError as e:
+        return Reply(success=False, msg=f"payload file {payload} is not valid: {e}")
+
+    if payload.settings.output.path is None:
+        log.info("Output path not set. Setting output path to %s", cwd)
+        payload.settings.output.path = cwd
+    if payload.settings.snapshot is not None and payload.settings.snapshot.path is None:
+        log.info("Snapshot path not set. Setting output path to %s", cwd)
+        payload.settings.snapshot.path = cwd
+    return Reply(success=True, data=payload)
+
 
 def submit(
     *,
     port: int,
     timeout: int,
     context: zmq.Context,
-    payload: str,
+    payload: Union[str, list[str]],
     jobname: str,
     **_: dict,
 ) -> Reply:
     """
     Job submission function.
 
-    Attempts to open the ``yaml/json`` file specified in the ``payload`` argument,
-    and submit it to tomato's queue.
+    Attempts to open the ``yaml/json`` file(s) specified in the ``payload`` argument,
+    and submit them to tomato's queue. Several payloads are submitted in a single
+    request to the tomato daemon; if any of the payloads cannot be loaded, no job
+    is submitted.
 
-    Reply contains information about the submitted job.
+    Reply contains information about the submitted job(s).
 
     Examples
     --------
@@ -60,6 +179,10 @@ def submit(
     >>> ketchup submit counter_15_0.1.yml -j jobname_is_this
     Success: job submitted successfully with jobid 1 and jobname 'jobname_is_this'
 
+    >>> # Submit several jobs at once:
+    >>> ketchup submit counter_15_0.1.yml counter_20_1.yml
+    Success: jobs submitted successfully with jobids [1, 2]
+
     >>> # Submit a job with yaml output:
     >>> ketchup submit counter_15_0.1.yml -y
     data:
@@ -73,52 +196,37 @@ def submit(
     success: true
 
     """
-    payload = Path(payload)
-    if payload.exists() and payload.is_file():
-        pass
-    else:
-        return Reply(success=False, msg=f"payload file {payload} not found")
-
-    with payload.open() as inf:
-        if payload.suffix == ".json":
-            pldict = json.load(inf)
-        elif payload.suffix in {".yml", ".yaml"}:
-            pldict = yaml.full_load(inf)
-        else:
-            return Reply(success=False, msg="payload must be a yaml or a json file")
-
-    payload = to_payload(**pldict)
-    maxver = Version(__latest_payload__)
-    while hasattr(payload, "update"):
-        temp = payload.update()
-        if hasattr(temp, "version"):
-            if Version(temp.version) > maxver:
-                break
-        payload = temp
-
-    if payload.settings.output.path is None:
-        cwd = str(Path().resolve())
-        log.info(f"Output path not set. Setting output path to {cwd}")
-        payload.settings.output.path = cwd
-    if payload.settings.snapshot is not None and payload.settings.snapshot.path is None:
-        cwd = str(Path().resolve())
-        log.info(f"Snapshot path not set. Setting output path to {cwd}")
-        payload.settings.snapshot.path = cwd
+    if isinstance(payload, (str, Path)):
+        payload = [payload]
+    cwd = str(Path.cwd())
+    payloads = []
+    for path in payload:
+        ret = _load_payload(Path(path), cwd)
+        if not ret.success:
+            return ret
+        payloads.append(ret.data)
 
     log.debug("queueing 'payload' into 'queue'")
-    req = context.socket(zmq.REQ)
-    req.connect(f"tcp://127.0.0.1:{port}")
     dt = str(datetime.now(timezone.utc))
-    params = dict(payload=payload, jobname=jobname, submitted_at=dt)
-    req.send_pyobj(dict(cmd="job", id=None, params=params))
-    ret = req.recv_pyobj()
-    if ret.success:
+    if len(payloads) == 1:
+        params = dict(payload=payloads[0], jobname=jobname, submitted_at=dt)
+        msg = dict(cmd="job", id=None, params=params)
+    else:
+        params = [
+            dict(id=None, params=dict(payload=pl, jobname=jobname, submitted_at=dt))
+            for pl in payloads
+        ]
+        msg = dict(cmd="jobs", params=params)
+    ret = request(context, port, timeout, msg)
+    if not ret.success:
+        return Reply(success=False, msg=ret.msg, data=ret.data)
+    elif len(payloads) == 1:
         msg = f"job submitted successfully with jobid {ret.data.id}"
-        if ret.data.jobname is not None:
-            msg += f" and jobname {ret.data.jobname!r}"
-        return Reply(success=True, msg=msg, data=ret.data)
     else:
-        return Reply(success=False, msg="unknown error", data=ret.data)
+        msg = f"jobs submitted successfully with jobids {[job.id for job in ret.data]}"
+    if jobname is not None:
+        msg += f" and jobname {jobname!r}"
+    return Reply(success=True, msg=msg, data=ret.data)
 
 
 def status(
@@ -177,7 +285,7 @@ def status(
     elif len(jobids) == 0:
         rets = [job for job in jobs.values()]
     else:
-        rets = [job for job in jobs.values() if job.id in jobids]
+        rets = [jobs[jobid] for jobid in sorted(set(jobids)) if jobid in jobs]
     if len(rets) == 0:
         if len(jobids) == 1:
             msg = f"found no job with jobid {jobids}"
@@ -187,18 +295,17 @@ def status(
     elif len(rets) == 1:
         msg = f"found {len(rets)} job with status {[job.status for job in rets]}"
     else:
-        msg = ""
-        for st in ["q", "qw", "r", "rd", "c", "cd", "ce"]:
-            jobst = [j.id for j in rets if j.status == st]
-            if len(jobst) > 1:
-                msg += (
-                    f"found {len(jobst)} jobs with status {st!r:4s}: {jobst}\n         "
-                )
-            elif len(jobst) == 1:
-                msg += (
-                    f"found {len(jobst)} job with status {st!r:4s}: {jobst}\n         "
-                )
-        msg = msg.strip()
+        buckets = defaultdict(list)
+        for job in rets:
+            buckets[job.status].append(job.id)
+        parts = []
+        for st in _STATUS_ORDER:
+            jobst = buckets.get(st)
+            if jobst is None:
+                continue
+            word = "jobs" if len(jobst) > 1 else "job"
+            parts.append(f"found {len(jobst)} {word} with status {st!r:4s}: {jobst}")
+        msg = "\n         ".join(parts)
     return Reply(success=True, msg=msg, data=rets)
 
 
@@ -245,22 +352,18 @@ def cancel(
         if jobid not in jobs:
             return Reply(success=False, msg=f"job with jobid {jobid} does not exist")
 
-    req = context.socket(zmq.REQ)
-    req.connect(f"tcp://127.0.0.1:{port}")
-    data = []
+    updates = []
     for jobid in jobids:
-        if jobs[jobid].status in {"q", "qw"}:
-            params = dict(status="cd")
-        elif jobs[jobid].status in {"r"}:
-            params = dict(status="rd")
-        elif jobs[jobid].status in {"cd", "ce", "c"}:
-            continue
-        req.send_pyobj(dict(cmd="job", id=jobid, params=params))
-        ret = req.recv_pyobj()
-        if ret.success:
-            data.append(ret.data)
-        else:
-            return Reply(success=False, msg="unknown error", data=ret.data)
+        newstatus = _CANCEL_STATUS.get(jobs[jobid].status)
+        if newstatus is not None:
+            updates.append(dict(id=jobid, params=dict(status=newstatus)))
+    if len(updates) == 0:
+        return Reply(success=True, msg="no jobs to cancel", data=[])
+
+    ret = request(context, port, timeout, dict(cmd="jobs", params=updates))
+    if not ret.success:
+        return Reply(success=False, msg=ret.msg, data=ret.data)
+    data = ret.data
     if len(data) == 1:
         msg = f"job {[j.id for j in data]} cancelled successfully"
     else:
@@ -288,6 +391,10 @@ def snapshot(
     Success: snapshot for job [3] created successfully
 
     """
+    from tomato.daemon.io import merge_netcdfs
+
+    if len(jobids) == 0:
+        return Reply(success=False, msg="no jobids supplied")
     jobs: list[Job] = status.data.jobs
     for jobid in jobids:
         if jobid not in jobs:
@@ -297,7 +404,14 @@ def snapshot(
 
     for jobid in jobids:
         jobs[jobid].snappath = f"snapshot.{jobid}.nc"
-        merge_netcdfs(jobs[jobid], snapshot=True)
+    # the merges of individual jobs are independent and mostly IO-bound
+    with ThreadPoolExecutor(max_workers=min(8, len(jobids))) as executor:
+        merges = [
+            executor.submit(merge_netcdfs, jobs[jobid], snapshot=True)
+            for jobid in jobids
+        ]
+    for merge in merges:
+        merge.result()
     if len(jobids) > 1:
         msg = f"snapshot for jobs {jobids} created successfully"
     else:
@@ -309,13 +423,15 @@ def search(
     *,
     jobname: str,
     status: Daemon,
+    complete: bool = False,
     **_: dict,
 ) -> Reply:
     """
     Search the queue for a job that matches a given jobname.
 
     Searches the queue for a job that matches the ``jobname``, returns the
-    job status and ``jobid``.
+    job status and ``jobid``. Completed jobs are only searched if ``complete``
+    is set.
 
     Examples
     --------
@@ -332,7 +448,9 @@ def search(
     jobs = status.data.jobs
     ret = []
     for jobid, job in jobs.items():
-        if job.jobname is not None and jobname in job.jobname:
+        if job.jobname is None or (not complete and job.status in _COMPLETED):
+            continue
+        if jobname in job.jobname:
             ret.append(job)
     if len(ret) > 0:
         if len(ret) == 1:
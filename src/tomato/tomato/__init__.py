@@ -20,44 +20,54 @@ Also includes the following *pipeline* management functions:
 
 """
 
+import atexit
 import os
 import subprocess
 import textwrap
+import threading
+import time
 import json
 from pathlib import Path
 from datetime import datetime, timezone
 from importlib import metadata
 
 import logging
-import psutil
 import zmq
-import yaml
-import toml
 
+from tomato import load_toml, ipc_path
 from tomato.models import Reply, Pipeline, Device, Driver, Component
 
+# yaml and psutil are only imported by the functions that need them, as this module
+# is also imported by ketchup for its requests
+
 logger = logging.getLogger(__name__)
 VERSION = metadata.version("tomato")
-MAX_RETRIES = 10
 
 
-def set_loglevel(delta: int):
-    loglevel = min(max(30 - (10 * delta), 10), 50)
-    logging.basicConfig(level=loglevel)
-    logger.debug("loglevel set to '%s'", logging._levelToName[loglevel])
+def load_yaml(stream):
+    """Loads yaml from ``stream`` using the libyaml ``CSafeLoader``, if available."""
+    import yaml
+
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+    return yaml.load(stream, Loader=SafeLoader)
 
 
 def load_device_file(yamlpath: Path) -> dict:
     logger.debug("loading device file from '%s'", yamlpath)
     try:
-        with yamlpath.open("r") as infile:
-            jsdata = yaml.safe_load(infile)
+        with yamlpath.open("rb") as infile:
+            jsdata = load_yaml(infile)
     except FileNotFoundError:
         logger.error("device file not found. Running with default devices.")
         devpath = Path(__file__).parent / ".." / "data" / "default_devices.json"
         with devpath.open() as inp:
             jsdata = json.load(inp)
         logger.debug("writing default devices to '%s'", yamlpath)
+        import yaml
+
         with yamlpath.open("w") as outfile:
             yaml.dump(jsdata, outfile)
     return jsdata
@@ -128,13 +138,80 @@ def get_pipelines(
     return pips, cmps
 
 
-def _updater(context, port, cmd, params):
-    dreq = context.socket(zmq.REQ)
-    dreq.connect(f"tcp://127.0.0.1:{port}")
-    dreq.send_pyobj(dict(cmd=cmd, params=params, sender=f"{__name__}._updater"))
-    ret = dreq.recv_pyobj()
-    dreq.close()
-    return ret
+# each thread keeps its own sockets, as zmq sockets are not thread-safe
+_local = threading.local()
+
+
+def _get_req(
+    context: zmq.Context, port: int, ipc: bool = True
+) -> tuple[zmq.Socket, bool]:
+    """
+    Returns a :class:`zmq.REQ` socket connected to the tomato-daemon on ``port``, and
+    whether it is connected over ``ipc``.
+
+    The sockets are cached per thread, so that repeated calls from the same thread do
+    not have to set up a new connection. Only one socket is kept per ``port``: a
+    socket from a different ``context`` is closed and replaced. If ``ipc`` is set and
+    the tomato-daemon is listening on an ``ipc`` endpoint in the private folder of the
+    current user, it is used instead of ``tcp``.
+    """
+    sockets = _local.__dict__.setdefault("sockets", {})
+    if port in sockets and sockets[port][0].context is not context:
+        sockets.pop(port)[0].close()
+    if port not in sockets:
+        req = context.socket(zmq.REQ)
+        req.setsockopt(zmq.LINGER, 0)
+        req.setsockopt(zmq.REQ_RELAXED, 1)
+        req.setsockopt(zmq.REQ_CORRELATE, 1)
+        req.setsockopt(zmq.IMMEDIATE, 1)
+        req.setsockopt(zmq.TCP_KEEPALIVE, 1)
+        ipcpath = ipc_path(port) if ipc and zmq.has("ipc") else None
+        if ipcpath is not None and ipcpath.exists():
+            req.connect(f"ipc://{ipcpath}")
+            sockets[port] = (req, True)
+        else:
+            req.connect(f"tcp://127.0.0.1:{port}")
+            sockets[port] = (req, False)
+    return sockets[port]
+
+
+def request(context: zmq.Context, port: int, timeout: int, msg: dict) -> Reply:
+    """
+    Sends the ``msg`` to the tomato-daemon on ``port`` and waits at most ``timeout``
+    milliseconds for the reply. The socket is discarded if no reply arrives. If the
+    request over ``ipc`` fails, it is retried over ``tcp`` within the same ``timeout``.
+    """
+    t_end = time.perf_counter() + timeout / 1000
+    ipc = True
+    while True:
+        req, ipc = _get_req(context, port, ipc)
+        remaining = max(0, round((t_end - time.perf_counter()) * 1000))
+        # with zmq.IMMEDIATE, the send blocks until the connection is up; a local ipc
+        # endpoint connects at once, so a stale one only uses a tenth of the timeout
+        req.setsockopt(zmq.SNDTIMEO, remaining // 10 if ipc else remaining)
+        try:
+            req.send_pyobj(msg)
+            remaining = max(0, round((t_end - time.perf_counter()) * 1000))
+            if req.poll(remaining, zmq.POLLIN) != 0:
+                return req.recv_pyobj()
+        except zmq.Again:
+            pass
+        req.close()
+        _local.sockets.pop(port)
+        if not ipc:
+            break
+        logger.debug("no reply over ipc from port %d, retrying over tcp", port)
+        ipc = False
+    return Reply(
+        success=False,
+        msg=f"could not contact tomato-daemon in {timeout / 1000} s",
+    )
+
+
+@atexit.register
+def _close_sockets():
+    for req, _ in _local.__dict__.pop("sockets", {}).values():
+        req.close()
 
 
 def status(
@@ -184,22 +261,16 @@ def status(
 
     """
     logger.debug("checking status of tomato on port %d", port)
-    req = context.socket(zmq.REQ)
-    req.connect(f"tcp://127.0.0.1:{port}")
-    req.send_pyobj(dict(cmd="status", sender=f"{__name__}.status"))
-    poller = zmq.Poller()
-    poller.register(req, zmq.POLLIN)
-    events = dict(poller.poll(timeout))
-    if req in events:
-        rep = req.recv_pyobj()
+    rep = request(
+        context, port, timeout, dict(cmd="status", sender=f"{__name__}.status")
+    )
+    if rep.success:
         return Reply(
             success=True,
             msg=f"tomato running on port {port}",
             data=rep.data,
         )
     else:
-        req.setsockopt(zmq.LINGER, 0)
-        req.close()
         return Reply(
             success=False,
             msg=f"tomato not running on port {port}",
@@ -272,6 +343,8 @@ def start(
         "-V",
         f"{verbosity}",
     ]
+    import psutil
+
     if psutil.WINDOWS:
         cfs = subprocess.CREATE_NEW_PROCESS_GROUP
         subprocess.Popen(cmd, creationflags=cfs)
@@ -319,10 +392,7 @@ def stop(
     """
     stat = status(port=port, timeout=timeout, context=context)
     if stat.success:
-        req = context.socket(zmq.REQ)
-        req.connect(f"tcp://127.0.0.1:{port}")
-        req.send_pyobj(dict(cmd="stop"))
-        rep = req.recv_pyobj()
+        rep = request(context, port, timeout, dict(cmd="stop"))
         if rep.success:
             return Reply(success=True, msg=f"tomato on port {port} closed successfully")
         else:
@@ -400,7 +470,7 @@ def reload(
     kwargs = dict(port=port, timeout=timeout, context=context)
     logger.debug("Loading settings.toml file from %s.", appdir)
     try:
-        settings = toml.load(Path(appdir) / "settings.toml")
+        settings = load_toml(Path(appdir) / "settings.toml")
     except FileNotFoundError:
         return Reply(
             success=False,
@@ -411,19 +481,20 @@ def reload(
     devs = {dev["name"]: Device(**dev) for dev in devicefile["devices"]}
     pips, cmps = get_pipelines(devs, devicefile["pipelines"])
     drvs = {dev.driver: Driver(name=dev.driver) for dev in devs.values()}
-    logger.debug(f"{pips=}")
-    logger.debug(f"{cmps=}")
-    logger.debug(f"{devs=}")
-    logger.debug(f"{drvs=}")
+    logger.debug("pips=%r", pips)
+    logger.debug("cmps=%r", cmps)
+    logger.debug("devs=%r", devs)
+    logger.debug("drvs=%r", drvs)
     for drv in drvs.keys():
         if drv in settings["drivers"]:
             drvs[drv].settings.update(settings["drivers"][drv])
     ret = status(**kwargs)
     if not ret.success:
         return ret
-    req = context.socket(zmq.REQ)
-    req.connect(f"tcp://127.0.0.1:{port}")
-    req.send_pyobj(
+    ret = request(
+        context,
+        port,
+        timeout,
         dict(
             cmd="setup",
             settings=settings,
@@ -432,9 +503,8 @@ def reload(
             drvs=drvs,
             cmps=cmps,
             sender=f"{__name__}.reload",
-        )
+        ),
     )
-    ret = req.recv_pyobj()
     if ret.success:
         return Reply(
             success=True,
@@ -479,16 +549,18 @@ def pipeline_load(
             success=False, msg=f"pipeline {pipeline!r} is not empty, aborting", data=pip
         )
 
-    req = context.socket(zmq.REQ)
-    req.connect(f"tcp://127.0.0.1:{port}")
-    req.send_pyobj(
+    msg = request(
+        context,
+        port,
+        timeout,
         dict(
             cmd="pipeline",
             params=dict(sampleid=sampleid, name=pipeline),
             sender=f"{__name__}.pipeline_load",
         ),
     )
-    msg = req.recv_pyobj()
+    if not msg.success:
+        return msg
     return Reply(
         success=True, msg=f"loaded {sampleid!r} into {pipeline!r}", data=msg.data
     )
@@ -532,16 +604,18 @@ def pipeline_eject(
             success=False, msg="cannot eject from a running pipeline", data=pip
         )
 
-    req = context.socket(zmq.REQ)
-    req.connect(f"tcp://127.0.0.1:{port}")
-    req.send_pyobj(
+    rep = request(
+        context,
+        port,
+        timeout,
         dict(
             cmd="pipeline",
             params=dict(sampleid=None, ready=False, name=pipeline),
             sender=f"{__name__}.pipeline_eject",
-        )
+        ),
     )
-    rep = req.recv_pyobj()
+    if not rep.success:
+        return rep
     return Reply(
         success=True, msg=f"pipeline {pipeline!r} ejected succesffully", data=rep.data
     )
@@ -585,14 +659,16 @@ def pipeline_ready(
             success=False, msg="cannot mark a running pipeline as ready", data=pip
         )
 
-    req = context.socket(zmq.REQ)
-    req.connect(f"tcp://127.0.0.1:{port}")
-    req.send_pyobj(
+    rep = request(
+        context,
+        port,
+        timeout,
         dict(
             cmd="pipeline",
             params=dict(ready=True, name=pipeline),
             sender=f"{__name__}.pipeline_ready",
-        )
+        ),
     )
-    rep = req.recv_pyobj()
+    if not rep.success:
+        return rep
     return Reply(success=True, msg=f"pipeline {pipeline!r} set as ready", data=rep.data)
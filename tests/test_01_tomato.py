@@ -1,9 +1,11 @@
 import os
 from pathlib import Path
+import pytest
 import zmq
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
-from tomato import tomato
+from tomato import tomato, ipc_path
 from .utils import wait_until_tomato_running, wait_until_tomato_stopped
 
 PORT = 12345
@@ -155,3 +157,23 @@ def test_tomato_stop(start_tomato_daemon, stop_tomato_daemon):
         text = logf.read()
     assert "driver manager thread joined" in text
     assert "job manager thread joined" in text
+
+
+def test_tomato_status_stale_ipc(start_tomato_daemon, stop_tomato_daemon):
+    assert wait_until_tomato_running(port=PORT, timeout=5000)
+    ipcpath = ipc_path(PORT)
+    if ipcpath is None:
+        pytest.skip("no ipc support on this platform")
+    # replace the daemon's ipc socket with a stale file, tcp should still work
+    ipcpath.unlink(missing_ok=True)
+    ipcpath.touch()
+    ret = tomato.status(port=PORT, context=zmq.Context(), timeout=timeout)
+    print(f"{ret=}")
+    assert ret.success
+
+
+def test_tomato_status_threads(start_tomato_daemon, stop_tomato_daemon):
+    assert wait_until_tomato_running(port=PORT, timeout=5000)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        rets = list(executor.map(lambda _: tomato.status(**kwargs), range(16)))
+    assert all(ret.success for ret in rets)
@@ -42,6 +42,31 @@ def test_ketchup_submit_two(datadir, start_tomato_daemon, stop_tomato_daemon):
     assert ret.data.jobname == "job-2"
 
 
+def test_ketchup_submit_many(datadir, start_tomato_daemon, stop_tomato_daemon):
+    assert wait_until_tomato_running(port=PORT, timeout=5000)
+    os.chdir(datadir)
+    pls = ["counter_1_0.1.yml", "counter_5_0.2.yml"]
+    ret = ketchup.submit(**kwargs, payload=pls, jobname="batch")
+    print(f"{ret=}")
+    assert ret.success
+    assert [job.id for job in ret.data] == [1, 2]
+    assert all(job.jobname == "batch" for job in ret.data)
+
+
+def test_ketchup_submit_timeout(datadir):
+    os.chdir(datadir)
+    ret = ketchup.submit(
+        port=PORT + 1,
+        timeout=500,
+        context=CTXT,
+        payload="counter_1_0.1.yml",
+        jobname=None,
+    )
+    print(f"{ret=}")
+    assert ret.success is False
+    assert "could not contact tomato-daemon" in ret.msg
+
+
 def test_ketchup_status_empty(start_tomato_daemon, stop_tomato_daemon):
     assert wait_until_tomato_running(port=PORT, timeout=5000)
     status = tomato.status(**kwargs)
@@ -177,6 +202,24 @@ def test_ketchup_cancel_queued(pl, datadir, start_tomato_daemon, stop_tomato_dae
     assert ret.success
     assert ret.data[0].status == "cd"
 
+    status = tomato.status(**kwargs)
+    ret = ketchup.cancel(**kwargs, status=status, verbosity=0, jobids=[1])
+    print(f"{ret=}")
+    assert ret.success
+    assert ret.msg == "no jobs to cancel"
+
+
+def test_ketchup_cancel_two(datadir, start_tomato_daemon, stop_tomato_daemon):
+    args = [datadir, start_tomato_daemon, stop_tomato_daemon]
+    test_ketchup_submit_two(*args)
+
+    status = tomato.status(**kwargs)
+    ret = ketchup.cancel(**kwargs, status=status, verbosity=0, jobids=[1, 2])
+    print(f"{ret=}")
+    assert ret.success
+    assert [job.id for job in ret.data] == [1, 2]
+    assert all(job.status == "cd" for job in ret.data)
+
 
 @pytest.mark.parametrize(
     "pl",
@@ -218,3 +261,54 @@ def test_ketchup_search(datadir, start_tomato_daemon, stop_tomato_daemon):
     ret = ketchup.search(jobname="wrong", status=status)
     print(f"{ret=}")
     assert ret.success is False
+
+
+def test_ketchup_search_complete(datadir, start_tomato_daemon, stop_tomato_daemon):
+    args = [datadir, start_tomato_daemon, stop_tomato_daemon]
+    test_ketchup_submit_one("counter_1_0.1.yml", "counter", *args)
+    tomato.pipeline_load(**kwargs, pipeline="pip-counter", sampleid="counter_1_0.1")
+    tomato.pipeline_ready(**kwargs, pipeline="pip-counter")
+    assert wait_until_ketchup_status(jobid=1, status="c", port=PORT, timeout=5000)
+
+    status = tomato.status(**kwargs)
+    ret = ketchup.search(jobname="counter", status=status)
+    print(f"{ret=}")
+    assert ret.success is False
+
+    ret = ketchup.search(jobname="counter", status=status, complete=True)
+    print(f"{ret=}")
+    assert ret.success
+    assert ret.data[0].id == 1
+
+
+@pytest.mark.parametrize(
+    "pl, msg",
+    [
+        ("counter_1_0.1.txt", "must be a yaml or a json file"),
+        ("invalid.yml", "could not parse"),
+    ],
+)
+def test_ketchup_submit_invalid(pl, msg, datadir):
+    os.chdir(datadir)
+    with open(pl, "w") as out:
+        out.write("method: [")
+    ret = ketchup.submit(**kwargs, payload=["counter_1_0.1.yml", pl], jobname=None)
+    print(f"{ret=}")
+    assert ret.success is False
+    assert msg in ret.msg
+    assert pl in ret.msg
+
+
+def test_ketchup_jobs_partial(datadir, start_tomato_daemon, stop_tomato_daemon):
+    args = [datadir, start_tomato_daemon, stop_tomato_daemon]
+    test_ketchup_submit_two(*args)
+    params = [dict(id=jobid, params=dict(jobname="renamed")) for jobid in [1, 99, 2]]
+    ret = tomato.request(CTXT, PORT, 1000, dict(cmd="jobs", params=params))
+    print(f"{ret=}")
+    assert ret.success is False
+    assert "job 99 does not exist" in ret.msg
+    assert [job.id for job in ret.data] == [1]
+    assert ret.data[0].jobname == "renamed"
+
+    status = tomato.status(**kwargs)
+    assert status.data.jobs[2].jobname == "job-2"